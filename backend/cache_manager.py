@@ -3,15 +3,74 @@ Cache Manager Module
 Handles caching of scraped documentation to minimize network requests
 """
 
+import os
 import json
+import time
+import atexit
+import functools
 import hashlib
+import tempfile
+import threading
+import weakref
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from datetime import timedelta
+from typing import Optional, Dict, Any, Tuple
+
+try:
+    import xxhash
+except ImportError:
+    # xxhash is optional; fall back to a short stdlib digest
+    xxhash = None
+
+
+@functools.lru_cache(maxsize=1024)
+def _hash_url(url: str) -> str:
+    """Hash a URL into a 16 hex char key, memoized since URLs repeat a lot"""
+    if xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(url.encode())
+    return hashlib.blake2b(url.encode(), digest_size=8).hexdigest()
+
+
+# Live cache managers, flushed at exit without keeping them alive
+_managers: "weakref.WeakSet[CacheManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all() -> None:
+    """Flush buffered writes of every live cache manager at interpreter exit"""
+    for manager in list(_managers):
+        manager.flush()
 
 
 class CacheManager:
-    """Manages caching of scraped content"""
+    """
+    Manages caching of scraped content
+    
+    Each entry is stored as the raw UTF-8 content; the file's mtime is the
+    time it was cached, so no wrapper format has to be parsed on reads.
+    HTTP validators (ETag / Last-Modified) live in a small sidecar file so
+    expired entries can be revalidated instead of refetched.
+    
+    Writes are buffered in memory and flushed to disk in batches by a
+    background timer (and once more at interpreter exit). Expired entries
+    are never deleted on the read path; sweep_expired() reclaims them, and
+    start_sweeper() runs it periodically in the background.
+    """
+    
+    CACHE_SUFFIX = ".cache"
+    META_SUFFIX = ".meta"
+    TMP_SUFFIX = ".tmp"
+    # JSON-wrapped entries from before the raw-bytes layout; never read, always stale
+    LEGACY_SUFFIX = ".json"
+    
+    # Seconds to buffer writes before flushing them to disk
+    FLUSH_INTERVAL = 5.0
+    
+    # Seconds between background sweeps of expired entries
+    SWEEP_INTERVAL = 600.0
+    
+    # Expired entries with HTTP validators are kept this many TTLs for revalidation
+    REVALIDATE_TTLS = 7
     
     def __init__(self, cache_dir: str = "data/cache", ttl_hours: int = 24):
         """
@@ -23,7 +82,24 @@ class CacheManager:
         """
         self.cache_dir = Path(cache_dir)
         self.ttl = timedelta(hours=ttl_hours)
+        # Plain float seconds so expiry checks are a single subtraction
+        self._ttl_seconds = self.ttl.total_seconds()
+        
+        # In-memory index of cache key -> file size, built lazily on first use
+        self._index: Optional[Dict[str, int]] = None
+        self._index_bytes = 0
+        self._index_lock = threading.Lock()
+        
+        # Write-behind buffer of cache key -> (url, content, etag, last_modified, timestamp)
+        self._pending: Dict[str, Tuple[str, str, Optional[str], Optional[str], float]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        
         self._ensure_cache_dir()
+        _managers.add(self)
+        self._sweeper_started = False
+        self._sweeper_lock = threading.Lock()
     
     def _ensure_cache_dir(self) -> None:
         """Create cache directory if it doesn't exist"""
@@ -37,9 +113,47 @@ class CacheManager:
             url: The URL to generate key for
             
         Returns:
-            Hash-based cache key
+            Hash-based cache key (16 hex chars, not cryptographic)
         """
-        return hashlib.md5(url.encode()).hexdigest()
+        return _hash_url(url)
+    
+    def _load_index(self) -> Dict[str, int]:
+        """
+        Return the size index, scanning the cache directory once if needed
+        
+        Must be called with _index_lock held.
+        
+        Returns:
+            Mapping of cache key to file size in bytes
+        """
+        if self._index is None:
+            index = {}
+            try:
+                with os.scandir(self.cache_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(self.CACHE_SUFFIX):
+                            key = entry.name[:-len(self.CACHE_SUFFIX)]
+                            index[key] = entry.stat(follow_symlinks=False).st_size
+            except FileNotFoundError:
+                # Cache directory was removed while running; start over empty
+                self._ensure_cache_dir()
+            
+            self._index = index
+            self._index_bytes = sum(index.values())
+        
+        return self._index
+    
+    def _index_put(self, cache_key: str, size: int) -> None:
+        """Record a written entry in the size index"""
+        with self._index_lock:
+            index = self._load_index()
+            self._index_bytes += size - index.get(cache_key, 0)
+            index[cache_key] = size
+    
+    def _index_drop(self, cache_key: str) -> None:
+        """Remove a deleted entry from the size index"""
+        with self._index_lock:
+            self._index_bytes -= self._load_index().pop(cache_key, 0)
     
     def _get_cache_path(self, cache_key: str) -> Path:
         """
@@ -51,7 +165,59 @@ class CacheManager:
         Returns:
             Path to cache file
         """
-        return self.cache_dir / f"{cache_key}.json"
+        return self.cache_dir / f"{cache_key}{self.CACHE_SUFFIX}"
+    
+    def _get_meta_path(self, cache_key: str) -> Path:
+        """
+        Get the validator sidecar path for a cache key
+        
+        Args:
+            cache_key: The cache key
+            
+        Returns:
+            Path to the sidecar file
+        """
+        return self.cache_dir / f"{cache_key}{self.META_SUFFIX}"
+    
+    def _open_for_read(self, path: Path):
+        """
+        Open a cache file for a single sequential read
+        
+        Uses O_NOATIME and posix_fadvise where the OS supports them; both
+        are no-ops elsewhere.
+        
+        Args:
+            path: Path to the cache file
+            
+        Returns:
+            Binary file object
+            
+        Raises:
+            FileNotFoundError: If the file does not exist
+        """
+        flags = os.O_RDONLY | getattr(os, 'O_BINARY', 0)
+        noatime = getattr(os, 'O_NOATIME', 0)
+        
+        try:
+            fd = os.open(path, flags | noatime)
+        except PermissionError:
+            if not noatime:
+                raise
+            # O_NOATIME is only allowed for the file's owner
+            fd = os.open(path, flags)
+        
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        
+        try:
+            return os.fdopen(fd, 'rb')
+        except BaseException:
+            # fdopen does not take ownership of the descriptor when it fails
+            os.close(fd)
+            raise
     
     def get(self, url: str) -> Optional[str]:
         """
@@ -66,56 +232,201 @@ class CacheManager:
         cache_key = self._get_cache_key(url)
         cache_path = self._get_cache_path(cache_key)
         
-        if not cache_path.exists():
+        # Buffered writes are always fresh
+        with self._pending_lock:
+            pending = self._pending.get(cache_key)
+        if pending:
+            return pending[1]
+        
+        try:
+            # Opening directly both checks existence and gives us the file
+            f = self._open_for_read(cache_path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            # e.g. a directory or an unreadable file in place of the entry
+            print(f"Error reading cache for {url}: {e}")
             return None
         
         try:
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-            
-            # Check if cache has expired
-            cached_time = datetime.fromisoformat(cache_data['timestamp'])
-            if datetime.now() - cached_time > self.ttl:
-                # Cache expired, remove it
-                cache_path.unlink()
-                return None
-            
-            return cache_data['content']
+            with f:
+                # Check if cache has expired; the stale body is kept so that
+                # it can still be revalidated with get_validators()
+                if time.time() - os.fstat(f.fileno()).st_mtime > self._ttl_seconds:
+                    return None
+                
+                return f.read().decode('utf-8')
         
-        except Exception as e:
+        except (OSError, UnicodeDecodeError) as e:
+            # I/O failures, or a file not written by this cache (e.g. non UTF-8)
             print(f"Error reading cache for {url}: {e}")
             return None
     
-    def set(self, url: str, content: str) -> bool:
+    def get_validators(self, url: str) -> Dict[str, str]:
+        """
+        Build conditional request headers for a cached URL
+        
+        Args:
+            url: The URL to build headers for
+            
+        Returns:
+            If-None-Match / If-Modified-Since headers, empty if none are stored
+        """
+        cache_key = self._get_cache_key(url)
+        
+        # Validators are useless without a body to fall back on
+        if not self._get_cache_path(cache_key).exists():
+            return {}
+        
+        try:
+            with open(self._get_meta_path(cache_key), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Error reading cache validators for {url}: {e}")
+            return {}
+        
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        
+        return headers
+    
+    def refresh_timestamp(self, url: str) -> bool:
+        """
+        Mark cached content as fresh again (e.g. after a 304 Not Modified)
+        
+        Args:
+            url: The URL whose cache entry was revalidated
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        cache_path = self._get_cache_path(self._get_cache_key(url))
+        
+        try:
+            now = time.time()
+            os.utime(cache_path, (now, now))
+            return True
+        except OSError as e:
+            print(f"Error refreshing cache for {url}: {e}")
+            return False
+    
+    def set(self, url: str, content: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> bool:
         """
         Store content in cache
         
+        The entry is visible to get() immediately and written to disk by
+        the next flush.
+        
         Args:
             url: The URL being cached
             content: The content to cache
+            etag: Optional ETag response header for revalidation
+            last_modified: Optional Last-Modified response header for revalidation
             
         Returns:
-            True if successful, False otherwise
+            Always True, since the entry is only buffered here; errors while
+            flushing it to disk are logged, not reported to the caller
         """
         cache_key = self._get_cache_key(url)
+        
+        with self._pending_lock:
+            self._pending[cache_key] = (url, content, etag, last_modified, time.time())
+            
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.FLUSH_INTERVAL, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        
+        return True
+    
+    def flush(self) -> None:
+        """Write all buffered cache entries to disk"""
+        with self._flush_lock:
+            with self._pending_lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                batch = dict(self._pending)
+            
+            for cache_key, entry in batch.items():
+                self._write_entry(cache_key, *entry)
+            
+            # Drop flushed entries unless they were overwritten meanwhile
+            with self._pending_lock:
+                for cache_key, entry in batch.items():
+                    if self._pending.get(cache_key) is entry:
+                        del self._pending[cache_key]
+    
+    def _write_entry(self, cache_key: str, url: str, content: str, etag: Optional[str],
+                     last_modified: Optional[str], timestamp: float) -> bool:
+        """
+        Write a single cache entry to disk
+        
+        Args:
+            cache_key: The cache key
+            url: The URL being cached
+            content: The content to cache
+            etag: Optional ETag response header
+            last_modified: Optional Last-Modified response header
+            timestamp: Time the entry was cached
+            
+        Returns:
+            True if successful, False otherwise
+        """
         cache_path = self._get_cache_path(cache_key)
+        meta_path = self._get_meta_path(cache_key)
         
         try:
-            cache_data = {
-                'url': url,
-                'content': content,
-                'timestamp': datetime.now().isoformat()
-            }
+            # The mtime doubles as the cache timestamp
+            data = content.encode('utf-8')
+            self._atomic_write(cache_path, data, timestamp)
             
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
+            if etag or last_modified:
+                meta = {'etag': etag, 'last_modified': last_modified}
+                self._atomic_write(meta_path, json.dumps(meta, separators=(',', ':')).encode('utf-8'))
+            elif meta_path.exists():
+                meta_path.unlink()
             
+            self._index_put(cache_key, len(data))
             return True
         
         except Exception as e:
             print(f"Error writing cache for {url}: {e}")
             return False
     
+    def _atomic_write(self, path: Path, data: bytes, mtime: Optional[float] = None) -> None:
+        """
+        Write a file via a temporary file and rename, so readers never see it half-written
+        
+        Args:
+            path: Destination path
+            data: Bytes to write
+            mtime: Optional modification time to stamp on the file
+        """
+        # A unique temp name per write, so concurrent writers (including other
+        # worker processes) never share or clobber each other's temp file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=path.name + '.',
+                                        suffix=self.TMP_SUFFIX)
+        
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            if mtime is not None:
+                os.utime(tmp_path, (mtime, mtime))
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    
     def invalidate(self, url: str) -> bool:
         """
         Invalidate (delete) cached content for a URL
@@ -130,8 +441,14 @@ class CacheManager:
         cache_path = self._get_cache_path(cache_key)
         
         try:
-            if cache_path.exists():
-                cache_path.unlink()
+            with self._flush_lock:
+                with self._pending_lock:
+                    self._pending.pop(cache_key, None)
+                
+                if cache_path.exists():
+                    cache_path.unlink()
+                self._get_meta_path(cache_key).unlink(missing_ok=True)
+                self._index_drop(cache_key)
             return True
         except Exception as e:
             print(f"Error invalidating cache for {url}: {e}")
@@ -145,25 +462,134 @@ class CacheManager:
             True if successful, False otherwise
         """
         try:
-            for cache_file in self.cache_dir.glob("*.json"):
-                cache_file.unlink()
+            with self._flush_lock:
+                with self._pending_lock:
+                    self._pending.clear()
+                
+                try:
+                    with os.scandir(self.cache_dir) as entries:
+                        for entry in entries:
+                            if entry.name.endswith((self.CACHE_SUFFIX, self.META_SUFFIX,
+                                                    self.TMP_SUFFIX, self.LEGACY_SUFFIX)):
+                                os.unlink(entry.path)
+                finally:
+                    # Rescan on next use; a failed unlink may have left files behind
+                    with self._index_lock:
+                        self._index = None
+                        self._index_bytes = 0
             return True
         except Exception as e:
             print(f"Error clearing cache: {e}")
             return False
     
+    def sweep_expired(self) -> int:
+        """
+        Delete expired cache entries in one batched directory pass
+        
+        Entries without validators are removed once they pass the TTL; entries
+        that can still be revalidated are kept for REVALIDATE_TTLS times longer.
+        Orphaned sidecars, temporary files older than SWEEP_INTERVAL and
+        legacy .json entries are removed as well.
+        
+        Returns:
+            Number of cache entries removed
+        """
+        now = time.time()
+        removed = 0
+        
+        with self._flush_lock:
+            try:
+                with os.scandir(self.cache_dir) as it:
+                    entries = {entry.name: entry for entry in it}
+            except OSError as e:
+                print(f"Error sweeping cache: {e}")
+                return 0
+            
+            for name, entry in entries.items():
+                # Failures are per entry (e.g. a file held open on Windows)
+                # so one stuck file doesn't end the whole pass
+                try:
+                    if name.endswith(self.LEGACY_SUFFIX):
+                        # Old-format entry nothing reads anymore
+                        os.unlink(entry.path)
+                        continue
+                    
+                    if name.endswith(self.TMP_SUFFIX):
+                        # Leftover from an interrupted write; recent ones may
+                        # still be in progress in another worker process
+                        if now - entry.stat(follow_symlinks=False).st_mtime > self.SWEEP_INTERVAL:
+                            os.unlink(entry.path)
+                        continue
+                    
+                    if name.endswith(self.META_SUFFIX):
+                        body_name = name[:-len(self.META_SUFFIX)] + self.CACHE_SUFFIX
+                        if body_name not in entries:
+                            os.unlink(entry.path)
+                        continue
+                    
+                    if not name.endswith(self.CACHE_SUFFIX):
+                        continue
+                    
+                    cache_key = name[:-len(self.CACHE_SUFFIX)]
+                    meta_name = cache_key + self.META_SUFFIX
+                    max_age = self._ttl_seconds
+                    if meta_name in entries:
+                        max_age *= self.REVALIDATE_TTLS
+                    
+                    if now - entry.stat(follow_symlinks=False).st_mtime <= max_age:
+                        continue
+                    
+                    os.unlink(entry.path)
+                    self._index_drop(cache_key)
+                    removed += 1
+                    
+                    if meta_name in entries:
+                        os.unlink(entries[meta_name].path)
+                
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Error sweeping cache entry {name}: {e}")
+        
+        return removed
+    
+    def start_sweeper(self) -> None:
+        """Start running sweep_expired every SWEEP_INTERVAL seconds (once per manager)"""
+        with self._sweeper_lock:
+            if self._sweeper_started:
+                return
+            self._sweeper_started = True
+        
+        self._schedule_sweep()
+    
+    def _schedule_sweep(self) -> None:
+        """Run sweep_expired once after SWEEP_INTERVAL, then reschedule"""
+        def run():
+            self.sweep_expired()
+            self._schedule_sweep()
+        
+        timer = threading.Timer(self.SWEEP_INTERVAL, run)
+        timer.daemon = True
+        timer.start()
+    
     def get_cache_stats(self) -> Dict[str, Any]:
         """
-        Get cache statistics
+        Get cache statistics from the in-memory index
+        
+        Buffered writes are flushed first so fresh entries are counted.
         
         Returns:
             Dictionary with cache statistics
         """
-        cache_files = list(self.cache_dir.glob("*.json"))
-        total_size = sum(f.stat().st_size for f in cache_files)
+        if self._pending:
+            self.flush()
+        
+        with self._index_lock:
+            total_items = len(self._load_index())
+            total_size = self._index_bytes
         
         return {
-            'total_items': len(cache_files),
+            'total_items': total_items,
             'total_size_bytes': total_size,
             'total_size_mb': round(total_size / (1024 * 1024), 2)
         }
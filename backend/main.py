@@ -8,7 +8,7 @@ from flask_cors import CORS
 import os
 import sys
 import webbrowser
-from threading import Timer
+from threading import Lock, Timer
 from pathlib import Path
 
 # Add backend directory to path for imports
@@ -25,20 +25,69 @@ app = Flask(__name__,
             static_url_path='')
 CORS(app)
 
+# Let browsers cache frontend assets and revalidate them with 304s
+STATIC_MAX_AGE = 3600
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
+
 # Initialize managers
 config_manager = ConfigManager()
 cache_manager = CacheManager()
+cache_manager.start_sweeper()
 doc_scraper = DocScraper(cache_manager)
 
-# Global tutor instance (will be initialized after API key is set)
-tutor = None
-documentation_context = None
+
+class TutorState:
+    """
+    Thread-safe holder for the tutor instance and its documentation context
+    
+    Callers take `lock` around any method call or tutor assignment.
+    """
+    
+    def __init__(self):
+        self.lock = Lock()
+        self.tutor = None  # Initialized after the API key is set
+        self.documentation_context = None
+    
+    def get_context(self) -> str:
+        """
+        Return the documentation context, scraping it on first use (caller holds the lock)
+        
+        Holding the lock makes concurrent callers wait for a single scrape
+        instead of each starting one.
+        
+        Returns:
+            The documentation context
+        """
+        if not self.documentation_context:
+            print("Scraping documentation for context...")
+            self.refresh_context()
+        return self.documentation_context
+    
+    def refresh_context(self) -> str:
+        """
+        Scrape documentation and rebuild the context (caller holds the lock)
+        
+        Returns:
+            The new documentation context
+        """
+        documentation = doc_scraper.get_all_documentation()
+        self.documentation_context = doc_scraper.build_context_summary(documentation)
+        
+        # Update tutor context if tutor is initialized
+        if self.tutor:
+            self.tutor.update_context(self.documentation_context)
+        
+        return self.documentation_context
+
+
+state = TutorState()
 
 
 @app.route('/')
 def index():
     """Serve the main HTML page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_from_directory(app.static_folder, 'index.html',
+                               conditional=True, max_age=STATIC_MAX_AGE)
 
 
 @app.route('/api/config/save-api-key', methods=['POST'])
@@ -89,22 +138,14 @@ def scrape_documentation():
     """
     Scrape Dart and Flutter documentation
     """
-    global documentation_context, tutor
-    
     try:
         print("\n" + "="*50)
         print("Starting documentation scraping...")
         print("="*50)
         
-        # Scrape all documentation
-        documentation = doc_scraper.get_all_documentation()
-        
-        # Build context summary
-        documentation_context = doc_scraper.build_context_summary(documentation)
-        
-        # Update tutor context if tutor is initialized
-        if tutor:
-            tutor.update_context(documentation_context)
+        # Scrape all documentation and update the tutor context
+        with state.lock:
+            documentation_context = state.refresh_context()
         
         # Get cache stats
         cache_stats = cache_manager.get_cache_stats()
@@ -130,8 +171,6 @@ def initialize_tutor():
     Initialize the AI tutor with the saved API key
     Also triggers documentation scraping
     """
-    global tutor, documentation_context
-    
     try:
         # Get API key
         api_key = config_manager.get_api_key()
@@ -142,14 +181,11 @@ def initialize_tutor():
                 'message': 'لم يتم العثور على مفتاح API. يرجى حفظه أولاً'
             }), 400
         
-        # Scrape documentation if not already done
-        if not documentation_context:
-            print("Scraping documentation for context...")
-            documentation = doc_scraper.get_all_documentation()
-            documentation_context = doc_scraper.build_context_summary(documentation)
-        
-        # Initialize tutor
-        tutor = DartFlutterTutor(api_key, documentation_context)
+        # Scrape documentation if not already done and initialize the tutor
+        # under the lock so a concurrent re-scrape can't update a stale tutor
+        with state.lock:
+            documentation_context = state.get_context()
+            state.tutor = DartFlutterTutor(api_key, documentation_context)
         
         return jsonify({
             'success': True,
@@ -171,7 +207,7 @@ def ask_tutor():
     
     Expected JSON: {"question": "..."}
     """
-    global tutor
+    tutor = state.tutor
     
     try:
         if not tutor:
@@ -217,7 +253,7 @@ def analyze_code():
     
     Expected JSON: {"code": "..."}
     """
-    global tutor
+    tutor = state.tutor
     
     try:
         if not tutor:
@@ -263,7 +299,7 @@ def generate_exercises():
     
     Expected JSON: {"topic": "..."}
     """
-    global tutor
+    tutor = state.tutor
     
     try:
         if not tutor:
@@ -309,7 +345,7 @@ def explain_concept():
     
     Expected JSON: {"concept": "..."}
     """
-    global tutor
+    tutor = state.tutor
     
     try:
         if not tutor:
@@ -352,8 +388,8 @@ def explain_concept():
 def get_status():
     """Get the current status of the application"""
     api_key_configured = config_manager.is_configured()
-    tutor_initialized = tutor is not None
-    context_loaded = documentation_context is not None
+    tutor_initialized = state.tutor is not None
+    context_loaded = state.documentation_context is not None
     
     cache_stats = cache_manager.get_cache_stats()
     
@@ -392,14 +428,14 @@ if __name__ == '__main__':
     print(f"⚙️  API Key Configured: {config_manager.is_configured()}")
     print("="*60 + "\n")
 
-    # Global variables for auto-init
+    # Auto-init the shared tutor state
     if config_manager.is_configured():
         try:
             print("Auto-initializing Darty...")
             api_key = config_manager.get_api_key()
             # We initialize without full context first to be fast, 
             # documentation will be loaded on first use or via sync
-            tutor = DartFlutterTutor(api_key, "")
+            state.tutor = DartFlutterTutor(api_key, "")
             print("✓ Darty is ready!")
         except Exception as e:
             print(f"✗ Auto-initialization failed: {e}")
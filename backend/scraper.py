@@ -3,11 +3,64 @@ Web Scraper Module
 Scrapes Dart and Flutter official documentation plus educational resources
 """
 
+import re
 import requests
+from html import unescape
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 from bs4 import BeautifulSoup
-from typing import Optional, Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, List, Tuple
 from cache_manager import CacheManager
 
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    # selectolax is optional; fall back to BeautifulSoup + lxml
+    HTMLParser = None
+
+# Tags whose text is never useful as documentation context
+STRIP_TAGS = ["script", "style", "nav", "footer", "header"]
+
+# Titles sit near the top of the page, so only its head is searched
+_TITLE_RE = re.compile(r'<title[^>]*>([^<]{1,300})</title>', re.IGNORECASE)
+TITLE_SEARCH_CHARS = 4096
+
+# Charset parameter of a Content-Type header
+_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+def _create_session() -> requests.Session:
+    """
+    Create an HTTP session with pooled keep-alive connections and retries
+    
+    Returns:
+        Configured requests session
+    """
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        # Only advertise encodings urllib3 can actually decode (br needs brotli)
+        'Accept-Encoding': ACCEPT_ENCODING,
+        'Connection': 'keep-alive'
+    })
+    
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    
+    return session
+
+
+# Shared by all scrapers so TCP/TLS connections to each host stay warm
+SESSION = _create_session()
+
 
 class DocScraper:
     """Scrapes Dart and Flutter documentation and educational resources"""
@@ -43,6 +96,12 @@ class DocScraper:
         "https://dart.dev/guides",
     ]
     
+    # Number of educational resources fetched concurrently
+    MAX_WORKERS = 8
+    
+    # Upper bound on bytes read per page; far more than the text we keep
+    MAX_RESPONSE_BYTES = 512 * 1024
+    
     def __init__(self, cache_manager: Optional[CacheManager] = None):
         """
         Initialize the documentation scraper
@@ -51,10 +110,7 @@ class DocScraper:
             cache_manager: Optional cache manager instance
         """
         self.cache_manager = cache_manager or CacheManager()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.session = SESSION
     
     def _fetch_url(self, url: str, use_cache: bool = True) -> Optional[str]:
         """
@@ -74,43 +130,111 @@ class DocScraper:
                 print(f"✓ Loaded from cache: {url}")
                 return cached_content
         
-        # Fetch from web
+        # Fetch from web, revalidating an expired cache entry when possible
         try:
+            headers = self.cache_manager.get_validators(url) if use_cache else {}
+            
             print(f"⬇ Fetching: {url}")
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            content = response.text
+            response = self.session.get(url, headers=headers, timeout=15, stream=True)
+            
+            if response.status_code == 304:
+                response.close()
+                if self.cache_manager.refresh_timestamp(url):
+                    cached_content = self.cache_manager.get(url)
+                    if cached_content:
+                        print(f"✓ Not modified, reusing cache: {url}")
+                        return cached_content
+                
+                # Cached body vanished in the meantime; fetch it unconditionally
+                response = self.session.get(url, timeout=15, stream=True)
+            
+            with response:
+                content, truncated = self._read_body(response)
             
-            # Cache the content
+            # Cache the content; a truncated body must never be revalidated
+            # as if it were the complete page
             if use_cache:
-                self.cache_manager.set(url, content)
+                if truncated:
+                    self.cache_manager.set(url, content)
+                else:
+                    self.cache_manager.set(
+                        url,
+                        content,
+                        etag=response.headers.get('ETag'),
+                        last_modified=response.headers.get('Last-Modified')
+                    )
             
             return content
         
-        except requests.RequestException as e:
+        except (requests.RequestException, Urllib3Error) as e:
             print(f"✗ Error fetching {url}: {e}")
             return None
     
-    def _extract_text_from_html(self, html: str, max_chars: int = 5000) -> str:
+    def _read_body(self, response: requests.Response) -> Tuple[str, bool]:
         """
-        Extract clean text from HTML
+        Read a streamed response body, bounded to MAX_RESPONSE_BYTES
+        
+        Args:
+            response: Response opened with stream=True
+            
+        Returns:
+            Tuple of decoded body text and whether the body was truncated
+        """
+        response.raise_for_status()
+        data = response.raw.read(self.MAX_RESPONSE_BYTES, decode_content=True)
+        truncated = (len(data) >= self.MAX_RESPONSE_BYTES
+                     and bool(response.raw.read(1, decode_content=True)))
+        
+        # Only trust an explicit charset; requests assumes ISO-8859-1 for any
+        # text/* response without one, which garbles UTF-8 pages
+        match = _CHARSET_RE.search(response.headers.get('Content-Type', ''))
+        encoding = match.group(1) if match else 'utf-8'
+        
+        try:
+            return data.decode(encoding, 'replace'), truncated
+        except LookupError:
+            # Unknown charset advertised by the server
+            return data.decode('utf-8', 'replace'), truncated
+    
+    def _parse_html(self, html: str):
+        """
+        Parse HTML once so title and text can share the same tree
         
         Args:
             html: HTML content
+            
+        Returns:
+            selectolax tree, or BeautifulSoup tree when selectolax is unavailable
+        """
+        if HTMLParser is not None:
+            return HTMLParser(html)
+        return BeautifulSoup(html, 'lxml')
+    
+    def _extract_text(self, document, max_chars: int = 5000) -> str:
+        """
+        Extract clean text from a parsed HTML document
+        
+        Args:
+            document: Tree returned by _parse_html
             max_chars: Maximum characters to extract
             
         Returns:
             Cleaned text
         """
         try:
-            soup = BeautifulSoup(html, 'lxml')
-            
-            # Remove script, style, nav, footer tags
-            for tag in soup(["script", "style", "nav", "footer", "header"]):
-                tag.decompose()
-            
-            # Get text
-            text = soup.get_text(strip=True, separator=' ')
+            if HTMLParser is not None:
+                # Remove script, style, nav, footer tags
+                for node in document.css(",".join(STRIP_TAGS)):
+                    node.decompose()
+                
+                root = document.body or document.root
+                text = root.text(separator=' ', strip=True) if root else ""
+            else:
+                # Remove script, style, nav, footer tags
+                for tag in document(STRIP_TAGS):
+                    tag.decompose()
+                
+                text = document.get_text(strip=True, separator=' ')
             
             # Clean up whitespace
             text = ' '.join(text.split())
@@ -121,6 +245,29 @@ class DocScraper:
             print(f"Error extracting text: {e}")
             return ""
     
+    def _extract_title(self, html: str, document, fallback: str) -> str:
+        """
+        Extract the page title, preferring a cheap regex over the page head
+        
+        Args:
+            html: HTML content
+            document: Tree returned by _parse_html, used if the regex misses
+            fallback: Title to use when the page has none
+            
+        Returns:
+            Page title or fallback
+        """
+        match = _TITLE_RE.search(html, 0, TITLE_SEARCH_CHARS)
+        if match:
+            title = unescape(match.group(1)).strip()
+        elif HTMLParser is not None:
+            node = document.css_first('title')
+            title = node.text(strip=True) if node else None
+        else:
+            title = document.title.string if document.title else None
+        
+        return title or fallback
+    
     def scrape_dart_archive(self) -> Optional[Dict[str, str]]:
         """
         Scrape Dart SDK archive page for latest versions
@@ -133,12 +280,12 @@ class DocScraper:
             return None
         
         try:
-            soup = BeautifulSoup(html, 'lxml')
+            document = self._parse_html(html)
             
             result = {
                 'url': self.DART_ARCHIVE_URL,
-                'title': soup.title.string if soup.title else 'Dart SDK Archive',
-                'content': self._extract_text_from_html(html, 3000)
+                'title': self._extract_title(html, document, 'Dart SDK Archive'),
+                'content': self._extract_text(document, 3000)
             }
             
             return result
@@ -159,12 +306,12 @@ class DocScraper:
             return None
         
         try:
-            soup = BeautifulSoup(html, 'lxml')
+            document = self._parse_html(html)
             
             result = {
                 'url': self.FLUTTER_RELEASES_URL,
-                'title': soup.title.string if soup.title else 'Flutter Release Notes',
-                'content': self._extract_text_from_html(html, 3000)
+                'title': self._extract_title(html, document, 'Flutter Release Notes'),
+                'content': self._extract_text(document, 3000)
             }
             
             return result
@@ -173,38 +320,61 @@ class DocScraper:
             print(f"Error parsing Flutter releases: {e}")
             return None
     
+    def _scrape_resource(self, url: str) -> Optional[Dict[str, str]]:
+        """
+        Fetch and parse a single educational resource
+        
+        Args:
+            url: URL to scrape
+            
+        Returns:
+            Dictionary with scraped content or None if failed
+        """
+        html = self._fetch_url(url)
+        if not html:
+            return None
+        
+        try:
+            document = self._parse_html(html)
+            
+            return {
+                'url': url,
+                'title': self._extract_title(html, document, url),
+                'content': self._extract_text(document, 2000)
+            }
+        
+        except Exception as e:
+            print(f"✗ Error parsing {url}: {e}")
+            return None
+    
     def scrape_educational_resources(self) -> List[Dict[str, str]]:
         """
-        Scrape all educational resource URLs
+        Scrape all educational resource URLs concurrently
         
         Returns:
-            List of dictionaries with scraped content
+            List of dictionaries with scraped content, in EDUCATIONAL_URLS order
         """
-        results = []
+        scraped = {}
+        total = len(self.EDUCATIONAL_URLS)
         
-        print(f"\n📚 Scraping {len(self.EDUCATIONAL_URLS)} educational resources...")
+        print(f"\n📚 Scraping {total} educational resources...")
         
-        for i, url in enumerate(self.EDUCATIONAL_URLS, 1):
-            print(f"\n[{i}/{len(self.EDUCATIONAL_URLS)}] Processing: {url}")
-            
-            html = self._fetch_url(url)
-            if not html:
-                continue
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(self._scrape_resource, url): i
+                for i, url in enumerate(self.EDUCATIONAL_URLS)
+            }
             
-            try:
-                soup = BeautifulSoup(html, 'lxml')
-                
-                result = {
-                    'url': url,
-                    'title': soup.title.string if soup.title else url,
-                    'content': self._extract_text_from_html(html, 2000)
-                }
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                if not result:
+                    continue
                 
-                results.append(result)
-                print(f"✓ Successfully scraped: {result['title'][:50]}...")
-            
-            except Exception as e:
-                print(f"✗ Error parsing {url}: {e}")
+                scraped[futures[future]] = result
+                print(f"[{done}/{total}] ✓ Successfully scraped: {result['title'][:50]}...")
+        
+        # Keep the original URL order so the context summary is stable
+        results = [scraped[i] for i in sorted(scraped)]
         
         print(f"\n✓ Successfully scraped {len(results)} resources\n")
         return results